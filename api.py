@@ -1,12 +1,24 @@
 from __future__ import annotations
-from fastapi import FastAPI, HTTPException, UploadFile, File
-from app import extract_invoice_fields
+from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks, Request
+from fastapi.concurrency import run_in_threadpool
+from app import extract_invoice_fields, ExtractionResult
+from collections import OrderedDict
+from dataclasses import asdict
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+import asyncio
 import hashlib
 import base64
+import mmap
+import multiprocessing
+import threading
 import time
 from pydantic import BaseModel, Field
 from typing import Optional, List, Literal, Any
-import requests
+import httpx
+import orjson
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
@@ -19,6 +31,99 @@ JAVA_BASE_URL = os.getenv("JAVA_BASE_URL", "http://localhost:8080")
 JAVA_TIMEOUT_SEC = float(os.getenv("JAVA_TIMEOUT_SEC", "10"))
 INTERNAL_API_KEY = os.getenv("INTERNAL_API_KEY")
 EXTRACTION_VERSION = 0
+EXTRACTION_CACHE_SIZE = int(os.getenv("EXTRACTION_CACHE_SIZE", "128"))
+EXTRACTION_CACHE_TTL_SEC = float(os.getenv("EXTRACTION_CACHE_TTL_SEC", "3600"))
+
+# last known push outcome per documentHash, oldest entries evicted first
+_PUSH_STATUS: OrderedDict[str, dict] = OrderedDict()
+_PUSH_STATUS_MAX = 1024
+_PUSH_STATUS_LOCK = threading.Lock()
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered by orjson (C, emits bytes directly)."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+# fresh interpreters for extraction workers: forking after the event loop and
+# threadpool threads exist can leave a child holding locks nobody will release
+_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+class _ExtractionPool:
+    """
+    Process pool for extract_invoice_fields that replaces itself when broken.
+    A worker that dies (native crash in the PDF parser, OOM kill) breaks the
+    whole executor; only the requests in flight on it fail, later ones get a new pool.
+    """
+
+    def __init__(self, max_workers: int | None):
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=_MP_CONTEXT)
+
+    async def run(self, fn, *args):
+        executor = self._executor
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            self._replace(executor)
+            raise
+
+    def _replace(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            # concurrent failures on the same executor rebuild it only once
+            if self._executor is broken:
+                self._executor = self._new_executor()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._executor.shutdown()
+
+
+class _ExtractionCache:
+    """
+    Thread-safe LRU of ExtractionResult keyed by documentHash.
+    Entries expire ttl seconds after they were stored.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, ExtractionResult]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> ExtractionResult | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: ExtractionResult) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+_EXTRACTION_CACHE = _ExtractionCache(EXTRACTION_CACHE_SIZE, EXTRACTION_CACHE_TTL_SEC)
+
 FieldType = Literal["string", "number", "date", "currency", "int","float"]
 class Options(BaseModel):
     doc_type: Optional[str] = "invoice"
@@ -55,44 +160,55 @@ class InvoiceResponse(BaseModel):
     document: DocumentResponse
     extraction: ExtractionResponse
 
+class PushStatus(BaseModel):
+    ok: Optional[bool] = None
+    scheduled: bool
+    error: Optional[str] = None
+    documentId: Optional[int] = None
+
+class ExtractResponse(InvoiceResponse):
+    pushToJava: PushStatus
+
+
+# built once at import; per-call headers only add the idempotency key
+_BASE_JAVA_HEADERS = {
+    "Content-Type": "application/json",
+    **({"X-Internal-Key": INTERNAL_API_KEY} if INTERNAL_API_KEY else {}),
+}
+
 
 def _java_headers(idem_key: str | None = None) -> dict:
-    h = {
-        "Content-Type": "application/json",
-    }
-    if INTERNAL_API_KEY:
-        h["X-Internal-Key"] = INTERNAL_API_KEY
-    if idem_key:
-        h["Idempotency-Key"] = idem_key     # dedupe on Java side
-    return h
-def _create_or_get_document(doc_hash: str, name: str, mime: str, pages: int) -> int:
+    if not idem_key:
+        return _BASE_JAVA_HEADERS
+    return {**_BASE_JAVA_HEADERS, "Idempotency-Key": idem_key}     # dedupe on Java side
+async def _create_or_get_document(client: httpx.AsyncClient, doc_hash: str, name: str, mime: str, pages: int) -> int:
     """
     Calls POST /api/documents and returns the integer documentId.
     Align the payload keys to your CreateDocumentRequest.
     """
-    url = f"{JAVA_BASE_URL}/api/documents"
+    url = "/api/documents"
     payload = {
         "documentHash": doc_hash,
         "name": name,
         "mime": mime,
         "pages": pages,
     }
-    r = requests.post(url, json=payload, headers=_java_headers(doc_hash), timeout=JAVA_TIMEOUT_SEC)
+    r = await client.post(url, content=orjson.dumps(payload), headers=_java_headers(doc_hash))
     if r.status_code not in (200, 201):  # your controller returns 201 CREATED
         raise RuntimeError(f"Doc create failed ({r.status_code}): {r.text}")
 
-    data = r.json()
+    data = orjson.loads(r.content)
     doc_id = data.get("documentId") or data.get("id")
     if not isinstance(doc_id, int):
         raise RuntimeError(f"Could not parse documentId from response: {data}")
     return doc_id
 
-def _post_extraction(document_id: int, invoice_payload: dict, idem_key: str):
+async def _post_extraction(client: httpx.AsyncClient, document_id: int, invoice_payload: dict, idem_key: str):
     """
     Calls POST /api/documents/{documentId}/extractions
     Build the body to match CreateExtractionRequest exactly.
     """
-    url = f"{JAVA_BASE_URL}/api/documents/{document_id}/extractions"
+    url = f"/api/documents/{document_id}/extractions"
     extraction = invoice_payload["extraction"]
     fields = extraction.get("fields", [])
 
@@ -115,25 +231,89 @@ def _post_extraction(document_id: int, invoice_payload: dict, idem_key: str):
         ],
     }
 
-    r = requests.post(url, json=req_body, headers=_java_headers(idem_key), timeout=JAVA_TIMEOUT_SEC)
+    r = await client.post(url, content=orjson.dumps(req_body), headers=_java_headers(idem_key))
     if r.status_code not in (200, 201):
         raise RuntimeError(f"Extraction post failed ({r.status_code}): {r.text}")
     return r
 
 
-def _process_extraction(filepath: str, display_name: str | None = None, mime_type: str | None = None) -> dict:
+@lru_cache(maxsize=256)
+def _file_digest(filepath: str, mtime_ns: int, size: int) -> str:
+    """
+    SHA-256 of the file contents, urlsafe-b64 encoded without padding.
+    mtime/size are part of the cache key so a rewritten file is re-hashed.
+    """
+    with open(filepath, "rb", buffering=0) as f:
+        if hasattr(hashlib, "file_digest"):  # 3.11+: readinto a reused buffer
+            digest = hashlib.file_digest(f, "sha256").digest()
+        else:
+            h = hashlib.sha256()
+            if os.fstat(f.fileno()).st_size:  # mmap rejects empty files
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    h.update(mm)
+            digest = h.digest()
+    return _encode_digest(digest)
+
+
+def _encode_digest(digest: bytes) -> str:
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+def _hash_file(filepath: str) -> str:
+    st = os.stat(filepath)
+    return _file_digest(os.path.abspath(filepath), st.st_mtime_ns, st.st_size)
+
+
+def _record_push_status(doc_hash: str, status: dict) -> None:
+    with _PUSH_STATUS_LOCK:
+        _PUSH_STATUS[doc_hash] = status
+        _PUSH_STATUS.move_to_end(doc_hash)
+        while len(_PUSH_STATUS) > _PUSH_STATUS_MAX:
+            _PUSH_STATUS.popitem(last=False)
+
+
+async def _push_to_java(client: httpx.AsyncClient, invoice_payload: dict) -> None:
+    """
+    Push a finished extraction to the Java backend.
+    Runs as a background task after the response has been sent; the outcome
+    is recorded in _PUSH_STATUS and exposed via GET /extract/{documentHash}/push.
     """
-    Run the Python extraction pipeline and push results to the Java backend.
+    document = invoice_payload["document"]
+    doc_hash = document["documentHash"]
+    push_status = {"ok": False, "scheduled": False, "error": None, "documentId": None}
+    try:
+        document_id = await _create_or_get_document(
+            client,
+            doc_hash=doc_hash,
+            name=document["filename"],
+            mime=document["mime"],
+            pages=document["pages"],
+        )
+        push_status["documentId"] = document_id
+        await _post_extraction(client, document_id=document_id, invoice_payload=invoice_payload, idem_key=doc_hash)
+        push_status["ok"] = True
+    except Exception as exc:
+        push_status["error"] = str(exc)
+    _record_push_status(doc_hash, push_status)
+
+
+async def _process_extraction(
+    filepath: str,
+    background_tasks: BackgroundTasks,
+    client: httpx.AsyncClient,
+    pool: _ExtractionPool,
+    display_name: str | None = None,
+    mime_type: str | None = None,
+    precomputed_hash: str | None = None,
+) -> dict:
+    """
+    Run the Python extraction pipeline and schedule the push to the Java backend.
     Returns the combined response payload that the API endpoints expose.
+    Pass precomputed_hash when the caller already hashed the file contents.
     """
     start = time.perf_counter()
     try:
-        h = hashlib.sha3_256()
-        with open(filepath, "rb") as f:
-            for chunk in iter(lambda: f.read(1 << 20), b""):
-                h.update(chunk)
-        digest = h.digest()
-        document_hash = base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+        document_hash = precomputed_hash or await run_in_threadpool(_hash_file, filepath)
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found")
     except HTTPException:
@@ -141,45 +321,42 @@ def _process_extraction(filepath: str, display_name: str | None = None, mime_typ
     except Exception as exc:
         raise HTTPException(status_code=400, detail=str(exc))
 
-    try:
-        result = extract_invoice_fields(filepath)
-    except HTTPException:
-        raise
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail=str(exc))
+    # identical content was parsed recently: skip the PDF pass entirely
+    result = _EXTRACTION_CACHE.get(document_hash)
+    if result is None:
+        try:
+            # CPU-bound PDF parsing runs in a worker process, off this process's GIL
+            result = await pool.run(extract_invoice_fields, filepath)
+        except HTTPException:
+            raise
+        except BrokenProcessPool as exc:
+            raise HTTPException(status_code=500, detail="Extraction worker crashed") from exc
+        except Exception as exc:
+            raise HTTPException(status_code=500, detail=str(exc))
+        _EXTRACTION_CACHE.set(document_hash, result)
 
     runtime_ms = time.perf_counter() - start
-    doc_resp = DocumentResponse(
-        documentHash=document_hash,
-        filename=Path(display_name or filepath).name,
-        mime=mime_type or "application/pdf",
-        pages=result.pages,
-    )
-    ext_resp = ExtractionResponse(
-        runtimeMs=runtime_ms,
-        warnings=result.warnings,
-        fields=[ExtractedField(**field.__dict__) for field in result.fields],
-    )
-    invoice_payload = InvoiceResponse(
-        status="success",
-        document=doc_resp,
-        extraction=ext_resp,
-    ).model_dump()
-
-    doc_hash = doc_resp.documentHash
-    push_status = {"ok": False, "error": None, "documentId": None}
-    try:
-        document_id = _create_or_get_document(
-            doc_hash=doc_hash,
-            name=doc_resp.filename,
-            mime=doc_resp.mime,
-            pages=doc_resp.pages,
-        )
-        push_status["documentId"] = document_id
-        _post_extraction(document_id=document_id, invoice_payload=invoice_payload, idem_key=doc_hash)
-        push_status["ok"] = True
-    except Exception as exc:
-        push_status["error"] = str(exc)
+    # built by hand in the InvoiceResponse shape; validating models we only
+    # serialize again would cost more than the extraction bookkeeping itself
+    invoice_payload = {
+        "status": "success",
+        "document": {
+            "documentHash": document_hash,
+            "filename": Path(display_name or filepath).name,
+            "mime": mime_type or "application/pdf",
+            "pages": result.pages,
+        },
+        "extraction": {
+            "extractionVersion": EXTRACTION_VERSION,
+            "runtimeMs": runtime_ms,
+            "warnings": list(result.warnings),
+            "fields": [asdict(field) for field in result.fields],
+        },
+    }
+
+    push_status = {"ok": None, "scheduled": True, "error": None, "documentId": None}
+    _record_push_status(document_hash, push_status)
+    background_tasks.add_task(_push_to_java, client, invoice_payload)
 
     return {
         **invoice_payload,
@@ -187,53 +364,95 @@ def _process_extraction(filepath: str, display_name: str | None = None, mime_typ
     }
 
 
-app = FastAPI(title = "DocInsights Extractor", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # one HTTP/2 keep-alive client shared by every call to the Java backend
+    transport = httpx.AsyncHTTPTransport(
+        http2=True,
+        retries=3,
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+    )
+    app.state.http = httpx.AsyncClient(
+        base_url=JAVA_BASE_URL,
+        transport=transport,
+        timeout=JAVA_TIMEOUT_SEC,
+        headers={"Content-Type": "application/json"},
+    )
+    app.state.pool = _ExtractionPool(max_workers=os.cpu_count())
+    try:
+        yield
+    finally:
+        await app.state.http.aclose()
+        app.state.pool.shutdown()
+
+
+app = FastAPI(title = "DocInsights Extractor", version="1.0.0", lifespan=lifespan, default_response_class=ORJSONResponse)
 app.mount("/ui", StaticFiles(directory="ui", html=True), name="ui")
 
-@app.post("/extract", response_model=InvoiceResponse)
-def extract(req:InvoiceRequest):
-    data = _process_extraction(req.filepath)
-    return JSONResponse(status_code=200, content=data)
+# payloads are built as dicts and sent as-is; the models only document them
+@app.post("/extract", response_model=None, responses={200: {"model": ExtractResponse}})
+async def extract(req:InvoiceRequest, request: Request, background_tasks: BackgroundTasks):
+    data = await _process_extraction(req.filepath, background_tasks, request.app.state.http, request.app.state.pool)
+    return ORJSONResponse(data)
+
+
+@app.get("/extract/{document_hash}/push", responses={200: {"model": PushStatus}})
+def get_push_status(document_hash: str):
+    with _PUSH_STATUS_LOCK:
+        status = _PUSH_STATUS.get(document_hash)
+    if status is None:
+        raise HTTPException(status_code=404, detail="No push recorded for this document")
+    return status
 
 @app.get("/getAllData")
-def get_data():
+async def get_data(request: Request):
     try:
-        resp = requests.get(
-            f"{JAVA_BASE_URL}/api/documents/allExtractions",
+        resp = await request.app.state.http.get(
+            "/api/documents/allExtractions",
             headers=_java_headers(),
-            timeout=JAVA_TIMEOUT_SEC,
         )
         resp.raise_for_status()
-    except requests.RequestException as exc:
+    except httpx.HTTPError as exc:
         raise HTTPException(status_code=502, detail=f"Java backend request failed: {exc}") from exc
 
     try:
-        return resp.json()
+        return ORJSONResponse(orjson.loads(resp.content))
     except ValueError as exc:
         raise HTTPException(status_code=502, detail="Java backend returned non-JSON response") from exc
 
 
-@app.post("/extract/upload")
-async def extract_upload(file: UploadFile = File(...)):
+def _write_and_hash(tmp, h, chunk: bytes) -> None:
+    h.update(chunk)
+    tmp.write(chunk)
+
+
+@app.post("/extract/upload", response_model=None, responses={200: {"model": ExtractResponse}})
+async def extract_upload(request: Request, background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     """
     Accept a file upload, run extraction, and return the same payload as /extract.
     """
     suffix = Path(file.filename or "upload").suffix
     tmp_path: str | None = None
     try:
+        # hash while spooling to disk so the temp file is never read back for hashing
+        h = hashlib.sha256()
         with tempfile.NamedTemporaryFile(delete=False, suffix=suffix or ".pdf") as tmp:
             tmp_path = tmp.name
             while True:
-                chunk = await file.read(1 << 20)
+                chunk = await file.read(1 << 22)
                 if not chunk:
                     break
-                tmp.write(chunk)
-        result = _process_extraction(
+                await run_in_threadpool(_write_and_hash, tmp, h, chunk)
+        result = await _process_extraction(
             tmp_path,
+            background_tasks,
+            request.app.state.http,
+            request.app.state.pool,
             display_name=file.filename or Path(tmp_path).name,
             mime_type=file.content_type,
+            precomputed_hash=_encode_digest(h.digest()),
         )
-        return JSONResponse(status_code=200, content=result)
+        return ORJSONResponse(result)
     finally:
         await file.close()
         if tmp_path and os.path.exists(tmp_path):
@@ -1,13 +1,30 @@
 # app.py
 from __future__ import annotations
+import importlib
 import re
+import sys
+from bisect import bisect_right
 from dataclasses import dataclass
 from datetime import date, datetime
-from typing import List, Optional, Tuple, Dict, Any
+from typing import List, Optional, Tuple, Dict, Any, Set, Iterator
 
 from pypdf import PdfReader
 
 
+def _import_pymupdf() -> Any:
+    # PyMuPDF: C-backed text extraction, much faster than pypdf. Releases
+    # before 1.24 only ship the legacy "fitz" name, which newer ones deprecate.
+    for name in ("pymupdf", "fitz"):
+        try:
+            return importlib.import_module(name)
+        except ImportError:
+            continue
+    return None  # pypdf alone still works
+
+
+pymupdf: Any = _import_pymupdf()
+
+
 _TOTAL_LABELS = (
     "total due",
     "amount due",
@@ -43,43 +60,102 @@ _VENDOR_HINTS = (
     "supplier",
     "billed by",
 )
+# candidate header line for the unlabeled vendor fallback
+_VENDOR_LINE_RE = re.compile(r"[A-Za-z0-9&@.\-,' ]{3,80}")
 
-def _compile_label_pattern(label: str) -> re.Pattern:
-    parts = [re.escape(p) for p in re.split(r"\s+", label.strip()) if p]
-    if not parts:
-        raise ValueError(f"Empty label: {label!r}")
-    pattern = r"(?<!\w)" + r"\W*".join(parts) + r"(?!\w)"
-    return re.compile(pattern, re.I)
+# separators never cross "\n", so one scan of the joined document finds
+# exactly the labels a per-line scan would
+_LABEL_SEP = r"[^\w\n]*"
+# atomic groups (3.11+) stop the engine re-entering a label trie it already
+# matched; each branch checks its own word boundary, so nothing is lost
+_ATOMIC_OPEN = "(?>" if sys.version_info >= (3, 11) else "(?:"
 
 
-_LABEL_PATTERNS: Dict[str, re.Pattern] = {
-    label: _compile_label_pattern(label)
-    for group in (_TOTAL_LABELS, _DATE_LABELS, _PO_LABELS)
-    for label in group
-}
-
+def _label_words(label: str) -> List[str]:
+    words = [w.lower() for w in re.split(r"\s+", label.strip()) if w]
+    if not words:
+        raise ValueError(f"Empty label: {label!r}")
+    return words
+
+
+def _trie_regex(node: Dict[str, Any]) -> str:
+    branches: List[str] = []
+    for word, child in node.items():
+        # prefer the longer label, then accept the shorter one at a word boundary
+        tails = [_LABEL_SEP + _trie_regex(child["next"])] if child["next"] else []
+        if child["end"]:
+            tails.append(r"(?!\w)")
+        tail = tails[0] if len(tails) == 1 else "(?:" + "|".join(tails) + ")"
+        branches.append(re.escape(word) + tail)
+    return "(?:" + "|".join(branches) + ")"
+
+
+def _label_trie_regex(labels: Tuple[str, ...]) -> str:
+    r"""Prefix-factored regex for labels, e.g. total(?:<sep>amount(?!\w)|(?!\w))."""
+    root: Dict[str, Any] = {}
+    for label in labels:
+        node = root
+        words = _label_words(label)
+        for i, word in enumerate(words):
+            entry = node.setdefault(word, {"next": {}, "end": False})
+            if i == len(words) - 1:
+                entry["end"] = True
+            node = entry["next"]
+    return _trie_regex(root)
+
+
+def _compile_label_pattern(groups: Dict[str, Tuple[str, ...]]) -> re.Pattern[str]:
+    # one named trie per label group; match.lastgroup says which group hit
+    alternation = "|".join(
+        f"(?P<{name}>{_ATOMIC_OPEN}{_label_trie_regex(labels)}))"
+        for name, labels in groups.items()
+    )
+    return re.compile(r"(?<!\w)(?:" + alternation + ")", re.I)
+
+
+_LABEL_RE = _compile_label_pattern({
+    "total": _TOTAL_LABELS,
+    "date": _DATE_LABELS,
+    "po": _PO_LABELS,
+})
+
+# value patterns never cross "\n", so they can scan a whole "\n"-joined document
 AMOUNT_RE = re.compile(
     r"""
     (?<![\w])
     (?P<currency>[$£€])?
-    \s*
+    [^\S\n]*
     (?P<amount>(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d{2})?)
     (?![\w])
     """,
     re.VERBOSE,
 )
-_PO_TOKEN_RE = re.compile(r"[A-Z0-9]+(?:[-/#][A-Z0-9]+)*", re.I)
+# the lookahead walks the token (separators only when followed by an alnum) and
+# requires a digit, so words like "Number" are never captured as the PO; the
+# lookbehinds only let a match start at a token boundary, otherwise search()
+# retries the lookahead at every offset of a long digit-free token (quadratic)
+_PO_TOKEN_RE = re.compile(
+    r"(?<![A-Z0-9])(?<![A-Z0-9][-/#])"
+    r"(?=(?:[A-Z0-9]|[-/#](?=[A-Z0-9]))*?[0-9])[A-Z0-9]+(?:[-/#][A-Z0-9]+)*",
+    re.I,
+)
+_MON_MAP = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+# indexes into DATE_RES, used by _iter_dates to pick the field order
+_DATE_ISO, _DATE_NUMERIC, _DATE_MONTH_NAME = 0, 1, 2
 DATE_RES = [
     # 2025-10-15
     re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b"),
     # 15/10/2025 or 15-10-2025
     re.compile(r"\b(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})\b"),
     # Oct 15, 2025 / October 15, 2025
-    re.compile(r"\b(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]*\s+(\d{1,2}),?\s+(\d{2,4})\b", re.I),
+    re.compile(r"\b(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]*[^\S\n]+(\d{1,2}),?[^\S\n]+(\d{2,4})\b", re.I),
 ]
 
 
-@dataclass
+@dataclass(slots=True)
 class ExtractedField:
     name: str
     value: Any
@@ -91,31 +167,75 @@ class ExtractedField:
     source: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class ExtractionResult:
     fields: List[ExtractedField]
     pages: int
     warnings: List[str]
 
 
-def _pdf_to_lines(path: str) -> Tuple[List[str], int]:
+def _mupdf_page_texts(path: str) -> List[str]:
+    # filetype pins the PDF parser; otherwise MuPDF picks one from the extension
+    # and happily opens text, HTML, SVG or image files
+    doc = pymupdf.open(path, filetype="pdf")
+    try:
+        if doc.needs_pass:
+            raise ValueError("PDF is password protected")
+        return [doc[i].get_text("text") for i in range(doc.page_count)]
+    finally:
+        doc.close()
+
+
+def _pypdf_page_texts(path: str) -> List[str]:
+    # serial on purpose: extract_text() is pure Python and holds the GIL, and
+    # this already runs inside one of the API's extraction worker processes
     reader = PdfReader(path)
-    pages = len(reader.pages)
-    lines: List[str] = []
-    for i in range(pages):
-        text = reader.pages[i].extract_text() or ""
+    return [page.extract_text() or "" for page in reader.pages]
+
+
+def _pdf_to_lines(path: str) -> Tuple[List[Tuple[int, str]], int]:
+    texts: Optional[List[str]] = None
+    if pymupdf is not None:
+        try:
+            texts = _mupdf_page_texts(path)
+        except Exception:
+            texts = None  # encrypted or odd PDFs: let pypdf have a go
+    if texts is None:
+        texts = _pypdf_page_texts(path)
+    pages = len(texts)
+
+    lines: List[Tuple[int, str]] = []
+    for i, text in enumerate(texts):
         for ln in text.splitlines():
             s = ln.strip()
             if s:
                 lines.append((i + 1, s))
-    # flatten to strings for easier scanning while preserving (page, text)
-    return [f"{p}|||{t}" for p, t in lines], pages
+    return lines, pages
+
+
+def _join_lines(lines: List[Tuple[int, str]]) -> Tuple[str, List[int]]:
+    """
+    Join line texts with "\n" and return the start offset of every line,
+    so bisect_right(line_starts, offset) - 1 maps a match back to its line.
+    """
+    line_starts: List[int] = []
+    parts: List[str] = []
+    pos = 0
+    for _, txt in lines:
+        line_starts.append(pos)
+        parts.append(txt)
+        pos += len(txt) + 1
+    return "\n".join(parts), line_starts
 
 
 def _norm_amount(s: str) -> Optional[Tuple[float, Optional[str]]]:
     m = AMOUNT_RE.search(s)
     if not m:
         return None
+    return _amount_from_match(m)
+
+
+def _amount_from_match(m: re.Match[str]) -> Optional[Tuple[float, Optional[str]]]:
     amt = m.group("amount")
     cur = m.group("currency")
     try:
@@ -135,32 +255,34 @@ def _norm_date_fragment(y: int, m: int, d: int) -> Optional[date]:
 
 
 def _extract_dates(s: str) -> List[date]:
-    out: List[date] = []
-    for rx in DATE_RES:
+    return [d for _, d in _iter_dates(s)]
+
+
+def _iter_dates(s: str) -> Iterator[Tuple[int, date]]:
+    """Yield (match offset, date) for every valid date in s."""
+    # dispatch on the pattern's position in DATE_RES, not on its source text
+    for idx, rx in enumerate(DATE_RES):
         for g in rx.finditer(s):
-            if rx.pattern.startswith(r"\b(\d{4})-"):
+            if idx == _DATE_ISO:
                 d = _norm_date_fragment(int(g[1]), int(g[2]), int(g[3]))
-            elif "Jan" in rx.pattern or "Jan" in rx.pattern:
-                # month name
-                mon_map = {
-                    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
-                    "jul": 7, "aug": 8, "sep": 9, "sept": 9, "oct": 10, "nov": 11, "dec": 12
-                }
-                m = mon_map[g[1].lower()[:3]]
-                d = _norm_date_fragment(int(g[3]), m, int(g[2]))
-            else:
+            elif idx == _DATE_NUMERIC:
                 # dd/mm/yyyy (assume non-US if ambiguous); you can flip if needed
                 d = _norm_date_fragment(int(g[3]), int(g[2]), int(g[1]))
+            elif idx == _DATE_MONTH_NAME:
+                d = _norm_date_fragment(int(g[3]), _MON_MAP[g[1].lower()[:3]], int(g[2]))
+            else:
+                raise ValueError(f"No field order defined for DATE_RES[{idx}]")
             if d:
-                out.append(d)
-    return out
+                yield g.start(), d
 
 
-def _label_in(s: str, labels: Tuple[str, ...]) -> bool:
-    for lbl in labels:
-        if _LABEL_PATTERNS[lbl].search(s):
-            return True
-    return False
+def _label_hits(doc_text: str, line_starts: List[int]) -> Dict[int, Set[str]]:
+    """Map line index -> label groups found on that line, from one scan of doc_text."""
+    hits: Dict[int, Set[str]] = {}
+    for m in _LABEL_RE.finditer(doc_text):
+        if m.lastgroup:
+            hits.setdefault(bisect_right(line_starts, m.start()) - 1, set()).add(m.lastgroup)
+    return hits
 
 
 def _value_after_delimiter(text: str) -> Optional[str]:
@@ -172,13 +294,13 @@ def _value_after_delimiter(text: str) -> Optional[str]:
     return None
 
 
-def _maybe_vendor(line: str) -> Optional[Tuple[str, float]]:
+def _maybe_vendor(txt: str) -> Optional[Tuple[str, float]]:
     # crude heuristic: if a line is ALLCAPS words and contains vendor hints nearby
-    txt = line.split("|||", 1)[1]
     if len(txt) < 3:
         return None
     # Strong hint: "Invoice from X", "Vendor: X"
-    if any(h in txt.lower() for h in _VENDOR_HINTS):
+    low = txt.lower()
+    if any(h in low for h in _VENDOR_HINTS):
         # take the bit after colon if present
         cand = _value_after_delimiter(txt) or txt
         cand = cand.strip()
@@ -186,7 +308,7 @@ def _maybe_vendor(line: str) -> Optional[Tuple[str, float]]:
             return cand, 0.9
         return None
     # fallback: first non-empty, mostly alphabetic, title-case line could be vendor
-    if re.fullmatch(r"[A-Za-z0-9&@.\-,' ]{3,80}", txt) and (txt.isupper() or txt.istitle()):
+    if (txt.isupper() or txt.istitle()) and _VENDOR_LINE_RE.fullmatch(txt):
         return txt, 0.4
     return None
 
@@ -195,14 +317,16 @@ def extract_invoice_fields(path: str) -> ExtractionResult:
     lines, pages = _pdf_to_lines(path)
     warnings: List[str] = []
     fields: Dict[str, ExtractedField] = {}
+    doc_text, line_starts = _join_lines(lines)
+    label_hits = _label_hits(doc_text, line_starts)
+    no_hits: Set[str] = set()
 
     # pass 1: look for labeled totals and dates/po around labels
-    for line in lines:
-        page_num, txt = line.split("|||", 1)
-        p = int(page_num)
+    for idx, (p, txt) in enumerate(lines):
+        hits = label_hits.get(idx, no_hits)
 
         # TOTAL
-        if _label_in(txt, _TOTAL_LABELS):
+        if "total" in hits:
             amt = _norm_amount(txt)
             if amt:
                 val, unit = amt
@@ -218,7 +342,7 @@ def extract_invoice_fields(path: str) -> ExtractionResult:
                 )
 
         # INVOICE DATE
-        if _label_in(txt, _DATE_LABELS):
+        if "date" in hits:
             dates = _extract_dates(txt)
             if dates:
                 # choose earliest sensible date on same line
@@ -234,18 +358,13 @@ def extract_invoice_fields(path: str) -> ExtractionResult:
                 )
 
         # PO
-        if _label_in(txt, _PO_LABELS):
+        if "po" in hits:
             candidate = _value_after_delimiter(txt) or txt
-            token_match = None
-            for token in _PO_TOKEN_RE.findall(candidate):
-                # ensure there is at least one digit to avoid capturing words like "Number"
-                if any(ch.isdigit() for ch in token):
-                    token_match = token
-                    break
+            token_match = _PO_TOKEN_RE.search(candidate)
             if token_match:
                 fields["poNumber"] = ExtractedField(
                     name="poNumber",
-                    value=token_match,
+                    value=token_match.group(0),
                     type="string",
                     confidence=0.8,
                     page=p,
@@ -254,7 +373,7 @@ def extract_invoice_fields(path: str) -> ExtractionResult:
                 )
 
         # VENDOR (hinted)
-        vend = _maybe_vendor(line)
+        vend = _maybe_vendor(txt)
         if vend:
             value, conf = vend
             existing = fields.get("vendor")
@@ -269,18 +388,33 @@ def extract_invoice_fields(path: str) -> ExtractionResult:
                     source="header-line" if conf < 0.9 else "label",
                 )
 
-    # pass 2: if missing total/date, scan unlabeled candidates
-    if "total" not in fields:
-        # pick the largest amount on the document as a fallback
-        best: Tuple[float, int, Optional[str], str] | None = None
-        for line in lines:
-            p, txt = line.split("|||", 1)
-            am = _norm_amount(txt)
-            if not am:
-                continue
-            val, unit = am
-            if (best is None) or (val > best[0]):
-                best = (val, int(p), unit, txt)
+    # pass 2: if missing total/date, scan unlabeled candidates in one sweep
+    need_total = "total" not in fields
+    need_date = "invoiceDate" not in fields
+    # largest amount on the document, and earliest plausible date anywhere
+    best: Tuple[float, int, Optional[str], str] | None = None
+    earliest: Tuple[date, int] | None = None
+    if need_total or need_date:
+        # one finditer over the joined text instead of a regex call per line
+        if need_total:
+            last_idx = -1
+            for m in AMOUNT_RE.finditer(doc_text):
+                idx = bisect_right(line_starts, m.start()) - 1
+                if idx == last_idx:
+                    continue  # like _norm_amount, only a line's first amount counts
+                last_idx = idx
+                am = _amount_from_match(m)
+                if am:
+                    val, unit = am
+                    if (best is None) or (val > best[0]):
+                        best = (val, lines[idx][0], unit, lines[idx][1])
+        if need_date:
+            for offset, d in _iter_dates(doc_text):
+                p = lines[bisect_right(line_starts, offset) - 1][0]
+                if (earliest is None) or ((d, p) < earliest):
+                    earliest = (d, p)
+
+    if need_total:
         if best:
             val, p, unit, _ = best
             fields["total"] = ExtractedField(
@@ -296,15 +430,9 @@ def extract_invoice_fields(path: str) -> ExtractionResult:
         else:
             warnings.append("total:not_found")
 
-    if "invoiceDate" not in fields:
-        # pick earliest plausible date we see anywhere
-        candidates: List[Tuple[date, int]] = []
-        for line in lines:
-            p, txt = line.split("|||", 1)
-            for d in _extract_dates(txt):
-                candidates.append((d, int(p)))
-        if candidates:
-            d, p = sorted(candidates)[0]
+    if need_date:
+        if earliest:
+            d, p = earliest
             fields["invoiceDate"] = ExtractedField(
                 name="invoiceDate",
                 value=d.isoformat(),
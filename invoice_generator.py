@@ -1,12 +1,9 @@
 from faker import Faker
-from jinja2 import Environment, FileSystemLoader
-from weasyprint import HTML
-import json, random, os
+import argparse, orjson, random, os, sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, timedelta
 from pathlib import Path
 
-fake = Faker()
-
 # --- folders -------------------------------------------------
 base = Path(__file__).resolve().parent
 tpl_dir = base / "templates"
@@ -14,53 +11,186 @@ out_dir = base / "output"
 (out_dir / "invoices").mkdir(parents=True, exist_ok=True)
 (out_dir / "labels").mkdir(parents=True, exist_ok=True)
 
-env = Environment(loader=FileSystemLoader(str(tpl_dir)))
-template = env.get_template("invoice.html")
+# per-process state, set up once per worker by _init()
+renderer = "reportlab"
+env = None
+template = None
+# Faker strings are slow to generate and need little variety here, so each
+# worker samples fixed pools once (seeded, so every worker gets the same ones)
+_BS_POOL = None
+_COMPANY_POOL = None
+
+def _init(which:str = "reportlab"):
+    global renderer, env, template, _BS_POOL, _COMPANY_POOL
+    renderer = which
+    if renderer == "weasyprint":
+        # only the HTML renderer needs Jinja; imported here so reportlab runs
+        # don't pay for (or require) it
+        from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+        # workers share the compiled template through Jinja's on-disk bytecode cache
+        env = Environment(loader=FileSystemLoader(str(tpl_dir)),
+                          bytecode_cache=FileSystemBytecodeCache(),
+                          auto_reload=False)
+        env.filters["money"] = _money
+        template = env.get_template("invoice.html")
+    fake = Faker()
+    fake.seed_instance(0)
+    _BS_POOL = [fake.bs().title() for _ in range(1024)]
+    _COMPANY_POOL = [fake.company() for _ in range(256)]
 
 # --- helper --------------------------------------------------
-def gen_invoice(idx:int):
-    vendor = fake.company()
+def _money(cents:int) -> str:
+    # amounts are kept in integer cents and only turned into text for display
+    return f"{cents // 100}.{cents % 100:02d}"
+
+def _make_invoice(idx:int):
+    # seed from idx so an invoice's contents don't depend on which worker renders it
+    random.seed(idx)
+
+    vendor = random.choice(_COMPANY_POOL)
     invoice_date = (date.today() - timedelta(days=random.randint(0, 90))).isoformat()
     po_number = f"PO-{random.randint(10000, 99999)}"
     line_items = []
+    subtotal = 0
     for _ in range(random.randint(2, 5)):
         qty = random.randint(1, 10)
-        price = round(random.uniform(10, 200), 2)
+        price_cents = random.randint(1000, 20000)
+        line_total = qty * price_cents
+        subtotal += line_total
         line_items.append({
-            "desc": fake.bs().title(),
+            "desc": random.choice(_BS_POOL),
             "qty": qty,
-            "unit_price": price,
-            "total": round(qty * price, 2)
+            "unit_price": price_cents,
+            "total": line_total
         })
-    subtotal = round(sum(i["total"] for i in line_items), 2)
-    tax = round(subtotal * 0.05, 2)
-    total = round(subtotal + tax, 2)
-
-    html_str = template.render(
-        vendor=vendor, invoice_date=invoice_date, po_number=po_number,
-        line_items=line_items, subtotal=subtotal, tax=tax, invoice_total=total
-    )
+    tax = (subtotal * 5 + 50) // 100   # 5%, rounded half up to the cent
+    total = subtotal + tax
 
-    pdf_path = out_dir / "invoices" / f"invoice_{idx:03d}.pdf"
-    HTML(string=html_str).write_pdf(pdf_path)
+    return {
+        "vendor": vendor, "invoice_date": invoice_date, "po_number": po_number,
+        "line_items": line_items, "subtotal": subtotal, "tax": tax,
+        "invoice_total": total
+    }
 
+def _write_label(pdf_path:Path, idx:int, inv:dict):
     label = {
         "filename": pdf_path.name,
         "fields": [
-            {"name": "vendor", "value": vendor},
-            {"name": "invoice_date", "value": invoice_date},
-            {"name": "po_number", "value": po_number},
-            {"name": "invoice_total", "value": str(total)}
+            {"name": "vendor", "value": inv["vendor"]},
+            {"name": "invoice_date", "value": inv["invoice_date"]},
+            {"name": "po_number", "value": inv["po_number"]},
+            {"name": "invoice_total", "value": _money(inv["invoice_total"])}
         ],
-        "line_items": line_items
+        "line_items": [
+            {**item, "unit_price": _money(item["unit_price"]), "total": _money(item["total"])}
+            for item in inv["line_items"]
+        ]
     }
     json_path = out_dir / "labels" / f"invoice_{idx:03d}.json"
-    with open(json_path, "w") as f:
-        json.dump(label, f, indent=2)
+    json_path.write_bytes(orjson.dumps(label, option=orjson.OPT_INDENT_2))
     print(f"✅ Created {pdf_path.name}")
 
+def render_invoice_reportlab(inv:dict, path:Path):
+    """Draw the invoice as plain positioned text, same wording as the HTML template.
+
+    The extractor only reads the text layer, so this skips WeasyPrint's HTML
+    parse, CSS layout and shaping and is far cheaper per invoice.
+    """
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(str(path))
+    c.setFont("Helvetica-Bold", 18)
+    c.drawString(72, 760, "Invoice")
+    c.setFont("Helvetica", 10)
+    c.drawString(72, 730, f"Vendor: {inv['vendor']}")
+    c.drawString(72, 716, f"Invoice Date: {inv['invoice_date']}")
+    c.drawString(72, 702, f"PO Number: {inv['po_number']}")
+
+    y = 670
+    for x, head in ((72, "Description"), (330, "Qty"), (380, "Unit Price"), (470, "Total")):
+        c.drawString(x, y, head)
+    for item in inv["line_items"]:
+        y -= 16
+        c.drawString(72, y, item["desc"])
+        c.drawString(330, y, str(item["qty"]))
+        c.drawString(380, y, f"${_money(item['unit_price'])}")
+        c.drawString(470, y, f"${_money(item['total'])}")
+
+    y -= 32
+    for line in (f"Subtotal: ${_money(inv['subtotal'])}",
+                 f"Tax (5%): ${_money(inv['tax'])}",
+                 f"Total Due: ${_money(inv['invoice_total'])}"):
+        c.drawRightString(540, y, line)
+        y -= 16
+    c.save()
+
+def _render_weasyprint(invoices:list, paths:list):
+    """Render several invoices with one WeasyPrint layout pass, one PDF each.
+
+    Fonts, CSS and the Pango/Cairo setup are paid once per batch instead of
+    once per invoice; the template puts every invoice on its own page, so
+    each page is copied out into its own file.
+    """
+    from weasyprint import HTML
+
+    doc = HTML(string=template.render(invoices=invoices)).render()
+    if len(doc.pages) == len(invoices):
+        for page, pdf_path in zip(doc.pages, paths):
+            doc.copy([page]).write_pdf(pdf_path)
+    else:
+        # an invoice spilled onto a second page: fall back to one render each
+        for inv, pdf_path in zip(invoices, paths):
+            HTML(string=template.render(invoices=[inv])).write_pdf(pdf_path)
+
+def gen_batch(idxs:list):
+    if _BS_POOL is None:
+        _init(renderer)
+    invoices = [_make_invoice(i) for i in idxs]
+    paths = [out_dir / "invoices" / f"invoice_{i:03d}.pdf" for i in idxs]
+
+    if renderer == "weasyprint":
+        _render_weasyprint(invoices, paths)
+    else:
+        for inv, pdf_path in zip(invoices, paths):
+            render_invoice_reportlab(inv, pdf_path)
+
+    for idx, inv, pdf_path in zip(idxs, invoices, paths):
+        _write_label(pdf_path, idx, inv)
+
+def gen_invoice(idx:int):
+    gen_batch([idx])
+
+def gen_invoices(ex:ProcessPoolExecutor, n:int, workers:int):
+    idxs = list(range(1, n + 1))
+    # rendering is CPU-bound and every invoice is independent: one batch per core
+    step = -(-len(idxs) // min(workers, len(idxs)))
+    batches = [idxs[i:i + step] for i in range(0, len(idxs), step)]
+    list(ex.map(gen_batch, batches))
+    print("All invoices generated in output/invoices/", flush=True)
+
 # --- main ----------------------------------------------------
 if __name__ == "__main__":
-    for i in range(1, 10):   # 50 invoices
-        gen_invoice(i)
-    print("All invoices generated in output/invoices/")
+    parser = argparse.ArgumentParser(description="Generate synthetic invoice PDFs and labels.")
+    parser.add_argument("--renderer", choices=("reportlab", "weasyprint"), default="reportlab",
+                        help="reportlab draws a text-only PDF (fast); weasyprint renders templates/invoice.html")
+    parser.add_argument("--serve", action="store_true",
+                        help="keep the warmed-up workers and read invoice counts from stdin, one per line")
+    args = parser.parse_args()
+
+    workers = os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init,
+                             initargs=(args.renderer,)) as ex:
+        if not args.serve:
+            gen_invoices(ex, 9, workers)   # 50 invoices
+        else:
+            for line in sys.stdin:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    n = int(line)
+                except ValueError:
+                    print(f"❌ Expected an invoice count, got {line!r}", flush=True)
+                    continue
+                if n > 0:
+                    gen_invoices(ex, n, workers)
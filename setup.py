@@ -0,0 +1,10 @@
+# Optional: compile the extraction module to a C extension with mypyc.
+#   pip install mypy && python setup.py build_ext --inplace
+# Python imports the built app.*.so ahead of app.py; delete it to fall back.
+from setuptools import setup
+from mypyc.build import mypycify
+
+setup(
+    name="docinsights-extractor",
+    ext_modules=mypycify(["--ignore-missing-imports", "app.py"]),
+)
@@ -50,6 +50,29 @@ async function fetchExtractions() {
   }
 }
 
+const PUSH_POLL_INTERVAL_MS = 500;
+const PUSH_POLL_ATTEMPTS = 60;
+
+// The Java push runs after /extract/upload responds; wait for its outcome so
+// the refreshed list actually contains the new document.
+async function waitForPush(documentHash) {
+  const url = `/extract/${encodeURIComponent(documentHash)}/push`;
+  for (let attempt = 0; attempt < PUSH_POLL_ATTEMPTS; attempt += 1) {
+    const response = await fetch(url, {
+      headers: { Accept: 'application/json' },
+    });
+    if (!response.ok) {
+      throw new Error(`Push status request failed with status ${response.status}`);
+    }
+    const status = await response.json();
+    if (status.ok !== null) {
+      return status;
+    }
+    await new Promise((resolve) => setTimeout(resolve, PUSH_POLL_INTERVAL_MS));
+  }
+  return null;
+}
+
 async function submitExtraction(event) {
   event.preventDefault();
   if (!fileInput || !uploadBtn || !uploadStatus || !uploadOutput) {
@@ -79,11 +102,30 @@ async function submitExtraction(event) {
     }
     const data = await response.json();
     renderJson(uploadOutput, data);
-    uploadStatus.textContent = `Extracted ${file.name} at ${new Date().toLocaleTimeString()}`;
     fileInput.value = '';
     if (fileLabelText) {
       fileLabelText.textContent = 'Select a file…';
     }
+
+    uploadStatus.textContent = `Extracted ${file.name}; saving to backend…`;
+    let pushError = null;
+    try {
+      const push = await waitForPush(data.document.documentHash);
+      if (push === null) {
+        pushError = 'timed out waiting for the backend';
+      } else {
+        data.pushToJava = push;
+        renderJson(uploadOutput, data);
+        if (!push.ok) {
+          pushError = push.error || 'unknown error';
+        }
+      }
+    } catch (error) {
+      pushError = error.message;
+    }
+    uploadStatus.textContent = pushError
+      ? `Extracted ${file.name}, but saving to backend failed: ${pushError}`
+      : `Extracted ${file.name} at ${new Date().toLocaleTimeString()}`;
     await fetchExtractions();
   } catch (error) {
     showEmptyState(uploadOutput, error.message);